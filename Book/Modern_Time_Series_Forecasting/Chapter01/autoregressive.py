@@ -1,4 +1,9 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
+from scipy.signal import lfilter
 
 
 ### TimeSynth package has an open issue on its autoregressive function.  
@@ -51,7 +56,49 @@ class BaseSignal:
 
         """
         raise NotImplementedError
-__all__ = ['AutoRegressive']
+
+    @staticmethod
+    def _get_rng(random_state):
+        """Random generator used by a signal
+
+        Parameters
+        ----------
+        random_state : None, int, SeedSequence or np.random.Generator
+            None keeps the global ``np.random`` functions, anything else is
+            passed to ``np.random.default_rng``
+
+        Returns
+        -------
+        rng : module or np.random.Generator
+            object providing ``normal``
+        """
+        if random_state is None:
+            return np.random
+        return np.random.default_rng(random_state)
+
+__all__ = ['AutoRegressive', 'BatchAutoRegressive', 'write_npy', 'spawn_generators', 'sample_parallel']
+
+
+def spawn_generators(seed, n_streams):
+    """Independent, reproducible random generators
+
+    Stream i is derived from ``SeedSequence(seed).spawn(n_streams)[i]``, so it
+    only depends on seed and i, not on which process or worker uses it.
+
+    Parameters
+    ----------
+    seed : int or SeedSequence
+        Root seed shared by all streams
+    n_streams : int
+        Number of generators
+
+    Returns
+    -------
+    rngs : list of np.random.Generator
+    """
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    return [np.random.default_rng(child) for child in seed.spawn(n_streams)]
 
 
 class AutoRegressive(BaseSignal):
@@ -69,11 +116,14 @@ class AutoRegressive(BaseSignal):
         Standard deviation of the signal
     start_value : list (default [None])
         Starting value of the AR(p) process
+    random_state : None, int, SeedSequence or np.random.Generator (default None)
+        Source of the noise. None uses the global ``np.random`` functions.
         
     """
     
-    def __init__(self, ar_param=[None], sigma=0.5, start_value=[None]):
-        self.vectorizable = False
+    def __init__(self, ar_param=[None], sigma=0.5, start_value=[None], random_state=None):
+        self.vectorizable = True
+        self.rng = self._get_rng(random_state)
         ar_param.reverse()
         self.ar_param = ar_param
         self.sigma = sigma
@@ -100,8 +150,327 @@ class AutoRegressive(BaseSignal):
             sampled signal for time t
         """
         ar_value = sum(self.previous_value[i] * self.ar_param[i] for i in range(len(self.ar_param)))
-        noise = np.random.normal(loc=0.0, scale=self.sigma)
+        noise = self.rng.normal(loc=0.0, scale=self.sigma)
         ar_value += noise  # ar_value is now a scalar, noise is a scalar too
         self.previous_value = self.previous_value[1:] + [ar_value]
         return ar_value
 
+    def _initial_state(self):
+        """Filter state of ``lfilter`` equivalent to ``previous_value``
+
+        The state is accumulated in the same order as the sum in
+        ``sample_next`` so both paths round identically.
+        """
+        order = len(self.ar_param)
+        zi = [0.0] * order
+        for value in self.previous_value:
+            for k in range(order):
+                upper = zi[k + 1] if k + 1 < order else 0
+                zi[k] = upper + self.ar_param[order - 1 - k] * value
+        return np.array(zi, dtype=float)
+
+    def sample_vectorized(self, time_vector):
+        """Sample all time points at once
+
+        Draws every noise term in a single call and runs the AR recursion as
+        a linear filter. For a fixed seed this gives the same values as
+        calling ``sample_next`` once per time point.
+
+        Parameters
+        ----------
+        time_vector : array-like
+            Times at which samples are required
+
+        Returns
+        -------
+        ar_values : np.ndarray
+            sampled signal for all times in time_vector
+        """
+        n_samples = len(time_vector)
+        if n_samples == 0:
+            return np.empty(0)
+        noise = self.rng.normal(loc=0.0, scale=self.sigma, size=n_samples)
+        # y[t] = phi_1 * y[t-1] + ... + phi_p * y[t-p] + e[t]
+        a = np.concatenate(([1.0], -np.asarray(self.ar_param[::-1], dtype=float)))
+        ar_values, _ = lfilter([1.0], a, noise, zi=self._initial_state())
+        history = list(self.previous_value) + ar_values[-len(self.ar_param):].tolist()
+        self.previous_value = history[-len(self.ar_param):]
+        return ar_values
+
+    def sample_chunks(self, n_samples, chunk_size=2**20):
+        """Sample n_samples time points in chunks of at most chunk_size
+
+        The lag state is carried from one chunk to the next, so the
+        concatenated chunks equal a single ``sample_vectorized`` call.
+
+        Parameters
+        ----------
+        n_samples : int
+            Total number of time points to sample
+        chunk_size : int (default 2**20)
+            Number of time points per chunk
+
+        Yields
+        ------
+        ar_values : np.ndarray
+            sampled signal for the next chunk of time points
+        """
+        for start in range(0, n_samples, chunk_size):
+            yield self.sample_vectorized(range(min(chunk_size, n_samples - start)))
+
+    def get_state(self):
+        """JSON-serializable state from which sampling can be resumed
+
+        Returns
+        -------
+        state : dict
+            AR parameters, lag state and the state of the random generator
+        """
+        if self.rng is np.random:
+            name, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+            random_state = [name, keys.tolist(), int(pos), int(has_gauss), float(cached_gaussian)]
+        else:
+            random_state = self.rng.bit_generator.state
+        return {
+            "ar_param": [float(v) for v in self.ar_param],
+            "sigma": float(self.sigma),
+            "previous_value": [float(v) for v in self.previous_value],
+            "random_state": random_state,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a generator from the output of ``get_state``
+
+        Also restores the random generator, either the global one or a
+        per-instance generator, so the next samples continue exactly where
+        the saved generator stopped.
+        """
+        signal = cls.__new__(cls)
+        signal.vectorizable = True
+        signal.ar_param = list(state["ar_param"])
+        signal.sigma = state["sigma"]
+        signal.start_value = list(state["previous_value"])
+        signal.previous_value = list(state["previous_value"])
+        random_state = state["random_state"]
+        if isinstance(random_state, dict):
+            bit_generator = getattr(np.random, random_state["bit_generator"])()
+            bit_generator.state = random_state
+            signal.rng = np.random.Generator(bit_generator)
+        else:
+            name, keys, pos, has_gauss, cached_gaussian = random_state
+            np.random.set_state((name, np.array(keys, dtype=np.uint32), pos, has_gauss, cached_gaussian))
+            signal.rng = np.random
+        return signal
+
+
+class BatchAutoRegressive(BaseSignal):
+    """Sample generator for many independent autoregressive (AR) signals.
+
+    Generates n_series AR(p) time series at once. The lag state of all
+    series is kept in a single 2-D ring buffer, so time and memory scale with
+    n_series x n_steps rather than with the number of Python objects.
+    NOTE: Only use this for regularly sampled signals
+
+    Parameters
+    ----------
+    ar_param : array-like, shape (n_series, p)
+        Parameters of each AR(p) process, one row per series
+        [[phi_1, phi_2, phi_3, .... phi_p], ...]
+        Series of lower order can be padded with zeros.
+    sigma : float or array-like, shape (n_series,) (default 0.5)
+        Standard deviation of each signal
+    start_value : array-like, shape (n_series, p) (default None)
+        Starting values of each AR(p) process, oldest first
+    dtype : numpy dtype (default np.float64)
+        dtype of the sampled matrix, float32 or float64
+    random_state : None, int, SeedSequence or np.random.Generator (default None)
+        Source of the noise. None uses the global ``np.random`` functions.
+
+    """
+
+    def __init__(self, ar_param, sigma=0.5, start_value=None, dtype=np.float64, random_state=None):
+        self.vectorizable = True
+        self.rng = self._get_rng(random_state)
+        ar_param = np.atleast_2d(np.asarray(ar_param, dtype=float))
+        n_series, order = ar_param.shape
+        self.n_series = n_series
+        self.order = order
+        self.dtype = np.dtype(dtype)
+        self.sigma = np.broadcast_to(np.asarray(sigma, dtype=float), (n_series,)).copy()
+        if start_value is None:
+            self.buffer = np.zeros((n_series, order))
+        else:
+            start_value = np.atleast_2d(np.asarray(start_value, dtype=float))
+            if start_value.shape != ar_param.shape:
+                raise ValueError("AR parameters do not match starting value")
+            self.buffer = start_value.copy()
+        # Column of the buffer holding the oldest lag, i.e. the next to overwrite
+        self.position = 0
+        # Coefficients aligned with the buffer for every ring position
+        reversed_param = ar_param[:, ::-1]
+        self._aligned_param = np.stack([np.roll(reversed_param, shift, axis=1)
+                                        for shift in range(order)])
+
+    @property
+    def previous_value(self):
+        """Lag state of every series, oldest first, shape (n_series, p)"""
+        return np.roll(self.buffer, -self.position, axis=1)
+
+    def _step(self):
+        ar_value = np.einsum("ij,ij->i", self.buffer, self._aligned_param[self.position])
+        ar_value += self.rng.normal(loc=0.0, scale=self.sigma)
+        self.buffer[:, self.position] = ar_value
+        self.position = (self.position + 1) % self.order
+        return ar_value
+
+    def sample_next(self, time, samples, errors):
+        """Sample a single time point of every series
+
+        Parameters
+        ----------
+        time : number
+            Time at which a sample was required
+
+        Returns
+        -------
+        ar_value : np.ndarray, shape (n_series,)
+            sampled signals for time t
+        """
+        return self._step().astype(self.dtype)
+
+    def sample_vectorized(self, time_vector, block_size=1024):
+        """Sample all time points of every series
+
+        Parameters
+        ----------
+        time_vector : array-like
+            Times at which samples are required
+        block_size : int (default 1024)
+            Number of time steps buffered before they are copied into the
+            C-contiguous output matrix
+
+        Returns
+        -------
+        ar_values : np.ndarray, shape (n_series, len(time_vector))
+            sampled signals, one row per series
+        """
+        n_steps = len(time_vector)
+        ar_values = np.empty((self.n_series, n_steps), dtype=self.dtype)
+        block = np.empty((min(block_size, n_steps), self.n_series))
+        for start in range(0, n_steps, block_size):
+            stop = min(start + block_size, n_steps)
+            for t in range(stop - start):
+                block[t] = self._step()
+            ar_values[:, start:stop] = block[:stop - start].T
+        return ar_values
+
+
+def write_npy(signal, path, n_samples, chunk_size=2**20, state_path=None):
+    """Stream an AutoRegressive signal into a .npy file chunk by chunk
+
+    Only one chunk is held in memory at a time. After every chunk the output
+    is flushed and the generator state is saved to state_path, so a crashed
+    job can be resumed by calling this function again with the same
+    arguments.
+
+    Parameters
+    ----------
+    signal : AutoRegressive
+        Generator to sample from. Ignored when resuming from state_path.
+    path : str or Path
+        Output .npy file, memory-mapped with shape (n_samples,)
+    n_samples : int
+        Total number of time points to write
+    chunk_size : int (default 2**20)
+        Number of time points per chunk
+    state_path : str or Path (default None)
+        JSON file holding the resumable state. Defaults to path + ".state.json"
+
+    Returns
+    -------
+    out : np.memmap
+        Memory-mapped array with the written samples
+    """
+    path = os.fspath(path)
+    state_path = os.fspath(state_path) if state_path is not None else path + ".state.json"
+
+    n_written = 0
+    if os.path.exists(state_path) and os.path.exists(path):
+        with open(state_path) as f:
+            saved = json.load(f)
+        signal = AutoRegressive.from_state(saved["signal"])
+        n_written = saved["n_written"]
+        out = np.lib.format.open_memmap(path, mode="r+")
+        if out.shape != (n_samples,):
+            raise ValueError("Existing file does not match n_samples")
+    else:
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(n_samples,))
+
+    for chunk in signal.sample_chunks(n_samples - n_written, chunk_size):
+        out[n_written:n_written + len(chunk)] = chunk
+        n_written += len(chunk)
+        out.flush()
+        # Write the state next to the target and rename, so it is never half written
+        with open(state_path + ".tmp", "w") as f:
+            json.dump({"n_written": n_written, "signal": signal.get_state()}, f)
+        os.replace(state_path + ".tmp", state_path)
+    return out
+
+
+def _sample_shard(ar_params, sigmas, start_values, seeds, n_samples):
+    """Sample a shard of series in a worker process, one generator per series"""
+    ar_values = np.empty((len(ar_params), n_samples))
+    for i, (ar_param, sigma, start_value, seed) in enumerate(zip(ar_params, sigmas, start_values, seeds)):
+        signal = AutoRegressive(list(ar_param), sigma, list(start_value), random_state=seed)
+        ar_values[i] = signal.sample_vectorized(range(n_samples))
+    return ar_values
+
+
+def sample_parallel(ar_params, sigmas, n_samples, seed, start_values=None, max_workers=None):
+    """Sample many AR(p) series reproducibly across processes
+
+    Series i always uses stream i of ``spawn_generators(seed, n_series)``, so
+    the result does not depend on max_workers or on how series are sharded.
+
+    Parameters
+    ----------
+    ar_params : list of list
+        AR parameters [phi_1, ..., phi_p] of every series
+    sigmas : list of float
+        Standard deviation of every series
+    n_samples : int
+        Number of time points per series
+    seed : int or SeedSequence
+        Root seed of all series
+    start_values : list of list (default None)
+        Starting values of every series, zeros if None
+    max_workers : int (default None)
+        Number of worker processes, ``os.cpu_count()`` if None
+
+    Returns
+    -------
+    ar_values : np.ndarray, shape (n_series, n_samples)
+        sampled signals, one row per series
+    """
+    n_series = len(ar_params)
+    if start_values is None:
+        start_values = [[0.0] * len(ar_param) for ar_param in ar_params]
+    if not isinstance(seed, np.random.SeedSequence):
+        seed = np.random.SeedSequence(seed)
+    seeds = seed.spawn(n_series)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    shards = np.array_split(np.arange(n_series), min(max_workers, n_series) or 1)
+    ar_values = np.empty((n_series, n_samples))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [(shard, executor.submit(_sample_shard,
+                                           [ar_params[i] for i in shard],
+                                           [sigmas[i] for i in shard],
+                                           [start_values[i] for i in shard],
+                                           [seeds[i] for i in shard],
+                                           n_samples))
+                   for shard in shards if len(shard)]
+        for shard, future in futures:
+            ar_values[shard] = future.result()
+    return ar_values
@@ -0,0 +1,93 @@
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from autoregressive import AutoRegressive, BatchAutoRegressive
+
+
+def loop_path(order, n_samples, rng):
+    signal = AutoRegressive(list(rng.uniform(-0.5, 0.5, order) / order), 1.0, random_state=rng)
+    return [signal.sample_next(t, None, None) for t in range(n_samples)]
+
+
+def vectorized_path(order, n_samples, rng):
+    signal = AutoRegressive(list(rng.uniform(-0.5, 0.5, order) / order), 1.0, random_state=rng)
+    return signal.sample_vectorized(range(n_samples))
+
+
+def batch_path(order, n_samples, rng, n_series=100):
+    # Same total number of samples, spread over n_series rows
+    ar_param = rng.uniform(-0.5, 0.5, (n_series, order)) / order
+    signal = BatchAutoRegressive(ar_param, 1.0, random_state=rng)
+    return signal.sample_vectorized(range(max(n_samples // n_series, 1)))
+
+
+PATHS = {
+    "loop": loop_path,
+    "vectorized": vectorized_path,
+    "batch": batch_path,
+}
+
+
+def measure(path, order, n_samples, repeat):
+    """Best samples/sec over repeat runs and peak traced memory in MiB"""
+    rng = np.random.default_rng(0)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        path(order, n_samples, rng)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    path(order, n_samples, rng)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return n_samples / best, peak / 2**20
+
+
+def crossover(results, order, slow, fast):
+    """Smallest length from which fast beats slow for all longer lengths"""
+    lengths = sorted(n for (name, p, n) in results if name == slow and p == order
+                     and (fast, p, n) in results)
+    point = None
+    for n in reversed(lengths):
+        if results[(fast, order, n)][0] <= results[(slow, order, n)][0]:
+            break
+        point = n
+    return point
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument("--min_exponent", type=int, default=3)
+    parser.add_argument("--max_exponent", type=int, default=7)
+    parser.add_argument("--max_loop_exponent", type=int, default=5,
+                        help="longest sample_next loop is 10**max_loop_exponent samples")
+    parser.add_argument("--paths", type=str, nargs="+", default=list(PATHS), choices=list(PATHS))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    lengths = [10**e for e in range(args.min_exponent, args.max_exponent + 1)]
+    results = {}
+
+    print(f"{'path':>10} {'p':>3} {'n':>9} {'samples/s':>12} {'peak MiB':>9}")
+    for order in args.orders:
+        for n_samples in lengths:
+            for name in args.paths:
+                if name == "loop" and n_samples > 10**args.max_loop_exponent:
+                    continue
+                rate, peak = measure(PATHS[name], order, n_samples, args.repeat)
+                results[(name, order, n_samples)] = (rate, peak)
+                print(f"{name:>10} {order:>3} {n_samples:>9} {rate:>12.3e} {peak:>9.2f}")
+
+    print()
+    print("Crossover (first length from which the second path is always faster)")
+    for slow, fast in [("loop", "vectorized"), ("loop", "batch"), ("batch", "vectorized")]:
+        if slow not in args.paths or fast not in args.paths:
+            continue
+        for order in args.orders:
+            point = crossover(results, order, slow, fast)
+            print(f"{slow:>10} -> {fast:<10} p={order:<3} n>={point if point else 'never'}")
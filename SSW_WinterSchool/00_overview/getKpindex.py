@@ -11,8 +11,49 @@ to run getKpindex function run:  from getKpindex import getKpindex
 -----------------------------------
 """
 
-from datetime import datetime
-import json, urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import http.client, json, os, random, threading, time, urllib.parse, urllib.request
+
+try:
+    # faster JSON parser if installed, same result as json.loads
+    from orjson import loads as __loads__
+except ImportError:
+    from json import loads as __loads__
+
+__url__ = 'https://kp.gfz-potsdam.de/app/json/'
+__pool__ = threading.local()
+
+# minutes between two values of each index, long requests are split into windows of __chunkpoints__ values
+__cadence__ = {'Kp': 180, 'ap': 180, 'Ap': 1440, 'Cp': 1440, 'C9': 1440, 'Hp30': 30, 'Hp60': 60,
+               'ap30': 30, 'ap60': 60, 'SN': 1440, 'Fobs': 1440, 'Fadj': 1440}
+__chunkpoints__ = 20000
+
+# longest wait in seconds between two attempts of a request
+__maxbackoff__ = 60
+__maxredirects__ = 5
+__statslock__ = threading.Lock()
+
+class KpindexError(Exception):
+    """
+    base class of the errors raised by getKpindex with errors='raise'
+    """
+
+class KpindexRequestError(KpindexError, ValueError):
+    """
+    invalid parameters: dates, index, status or output, retrying does not help
+    """
+
+class KpindexConnectionError(KpindexError, ConnectionError):
+    """
+    transient failure which remained after all retries: connection error, timeout, rate limit (429) or server error (5xx)
+    """
+
+class KpindexResponseError(KpindexError):
+    """
+    the server rejected the request (4xx) or answered with something that is not index data
+    """
 
 def __checkdate__(starttime,endtime):
     if starttime > endtime:
@@ -28,13 +69,424 @@ def __checkstatus__(status):
     if status not in ['all', 'def']:
         raise IndexError("Error! Wrong option parameter! \nAllowed are only the string parameter: 'def'")
     return True
+
+def __checkoutput__(output):
+    if output not in ['tuple', 'numpy', 'pandas']:
+        raise IndexError("Error! Wrong output parameter! \nAllowed are only the string parameter: 'tuple', 'numpy', 'pandas'")
+    return True
        
 def __addstatus__(url,status):
     if status == 'def':
         url = url + '&status=def'
     return url 
 
-def getKpindex(starttime, endtime, index, status='all'):
+def __buildurl__(d1, d2, index, status):
+    time_string = "start=" + d1.strftime('%Y-%m-%dT%H:%M:%SZ') + "&end=" + d2.strftime('%Y-%m-%dT%H:%M:%SZ')
+    url = __url__ + '?' + time_string  + "&index=" + index
+    if index not in ['Hp30', 'Hp60', 'ap30', 'ap60', 'Fobs', 'Fadj']:
+        url = __addstatus__(url, status)
+    return url
+
+def __getconnection__(scheme, netloc, timeout=None):
+    # one kept-alive connection per host and thread, http.client connections are not thread-safe
+    connections = getattr(__pool__, 'connections', None)
+    if connections is None:
+        connections = __pool__.connections = {}
+    if (scheme, netloc) not in connections:
+        if scheme == 'https':
+            connections[(scheme, netloc)] = http.client.HTTPSConnection(netloc, timeout=timeout)
+        else:
+            connections[(scheme, netloc)] = http.client.HTTPConnection(netloc, timeout=timeout)
+    conn = connections[(scheme, netloc)]
+    conn.timeout = timeout
+    if conn.sock is not None:
+        conn.sock.settimeout(timeout)
+    return conn
+
+def __useproxy__(parts):
+    # HTTP_PROXY / HTTPS_PROXY and no_proxy from the environment, as used by urllib.request
+    return parts.scheme in urllib.request.getproxies() and not urllib.request.proxy_bypass(parts.netloc)
+
+def __urlopen__(url, timeout=None):
+    """
+    GET url with urllib.request, which goes through the configured proxy and follows redirects
+    """
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.read()
+    except urllib.error.URLError:
+        raise
+    except (OSError, http.client.HTTPException) as er:
+        raise urllib.error.URLError(er)
+
+def __request__(url, timeout=None):
+    """
+    GET url over a reused keep-alive connection and return the body as bytes.
+    A connection closed by the server while idle is reopened once, redirects are followed.
+    If a proxy is configured for the host, the request is made with urllib.request instead.
+    """
+    for redirect in range(__maxredirects__ + 1):
+        parts = urllib.parse.urlsplit(url)
+        if __useproxy__(parts):
+            return __urlopen__(url, timeout)
+        target = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        for attempt in range(2):
+            conn = __getconnection__(parts.scheme, parts.netloc, timeout)
+            try:
+                conn.request('GET', target)
+                response = conn.getresponse()
+                binary = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as er:
+                conn.close()
+                if attempt == 1:
+                    raise urllib.error.URLError(er)
+                continue
+            except (OSError, http.client.HTTPException) as er:
+                # e.g. a timeout, or IncompleteRead of a body cut short, the connection can not be reused
+                conn.close()
+                raise urllib.error.URLError(er)
+            break
+        location = response.getheader('Location')
+        if response.status in (301, 302, 303, 307, 308) and location:
+            url = urllib.parse.urljoin(url, location)
+            continue
+        if response.status != 200:
+            raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+        return binary
+    raise urllib.error.HTTPError(url, response.status, 'Too many redirects', response.headers, None)
+
+def __transient__(code):
+    # too many requests (429) and server errors are worth retrying, other HTTP errors are not
+    return code == 429 or code >= 500
+
+def __retryrequest__(url, retries=0, timeout=None, backoff=0.5, stats=None):
+    """
+    __request__ repeated up to retries more times on connection errors, timeouts, 429 and 5xx responses.
+    Before retry n it waits a random time between 0 and backoff * 2**n seconds (exponential backoff
+    with full jitter), or the Retry-After seconds of the response if that is longer, at most __maxbackoff__.
+    If stats is a dict, the number of requests, attempts and retries and the latency of every request
+    in seconds are added to it.
+    """
+    start = time.perf_counter()
+    attempt = 0
+    try:
+        while True:
+            retry_after = 0
+            try:
+                return __request__(url, timeout)
+            except urllib.error.HTTPError as er:
+                if not __transient__(er.code) or attempt == retries:
+                    raise
+                # a rate-limited response may say how long to wait
+                if er.headers is not None and (er.headers.get('Retry-After') or '').strip().isdigit():
+                    retry_after = int(er.headers['Retry-After'])
+            except urllib.error.URLError:
+                if attempt == retries:
+                    raise
+            time.sleep(min(__maxbackoff__, max(retry_after, random.uniform(0, backoff * 2 ** attempt))))
+            attempt += 1
+    finally:
+        if stats is not None:
+            with __statslock__:
+                stats['requests'] = stats.get('requests', 0) + 1
+                stats['attempts'] = stats.get('attempts', 0) + attempt + 1
+                stats['retries'] = stats.get('retries', 0) + attempt
+                stats.setdefault('latency', []).append(time.perf_counter() - start)
+
+def __fetch__(d1, d2, index, status, retries=0, timeout=None, backoff=0.5, stats=None):
+    binary = __retryrequest__(__buildurl__(d1, d2, index, status), retries, timeout, backoff, stats)
+    try:
+        data = __loads__(binary)
+        result_s = data["status"] if "status" in data else [None] * len(data["datetime"])
+        return data["datetime"], data[index], result_s
+    except (ValueError, KeyError):
+        # keep the response text, the server explains invalid requests in plain text
+        raise json.JSONDecodeError("Unexpected response", binary.decode('utf-8', 'replace'), 0)
+
+def __chunkwindows__(d1, d2, index):
+    """
+    split [d1, d2] into consecutive windows of at most __chunkpoints__ values of index
+    """
+    window = timedelta(minutes=__cadence__[index] * __chunkpoints__)
+    windows = []
+    start = d1
+    while window <= d2 - start:
+        windows.append((start, start + window - timedelta(seconds=1)))
+        start = start + window
+    windows.append((start, d2))
+    return windows
+
+def __fetchchunks__(d1, d2, index, status, retries=0, timeout=None, backoff=0.5, stats=None, max_workers=4):
+    """
+    download [d1, d2] window by window and yield (time, index, status) lists of every window in time order.
+    At most max_workers windows are downloaded or waiting to be consumed at once, so the memory
+    used for responses does not grow with the length of the time range.
+    """
+    windows = __chunkwindows__(d1, d2, index)
+    if len(windows) == 1:
+        yield __fetch__(d1, d2, index, status, retries, timeout, backoff, stats)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for start, end in windows:
+            pending.append(executor.submit(__fetch__, start, end, index, status, retries, timeout, backoff, stats))
+            if len(pending) >= max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def __mergeintervals__(intervals):
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+def __missingintervals__(d1, d2, intervals):
+    """
+    sub-ranges of [d1, d2] which are not covered by the merged intervals
+    """
+    missing = []
+    start = d1
+    covered = False
+    for a, b in intervals:
+        if b < start or a > d2:
+            continue
+        if a > start:
+            missing.append((start, a))
+        start = min(max(start, b), d2)
+        covered = True
+    if start < d2 or not covered:
+        missing.append((start, d2))
+    return missing
+
+def __cachedfetch__(d1, d2, index, status, cache_dir, retries=0, timeout=None, backoff=0.5, stats=None):
+    """
+    same as __fetch__, but keeps every downloaded interval in cache_dir and
+    only downloads the parts of [d1, d2] which are not cached yet.
+    An interval is only cached up to its last settled value: the last value before the first
+    one that is not definitive, or the last returned value for indices without status, because
+    values after it can still be published or corrected. If no further value fits between the
+    last settled value and the end of the interval, the whole interval is cached.
+    """
+    form = '%Y-%m-%dT%H:%M:%SZ'
+    cache_file = os.path.join(cache_dir, index + '_' + status + '.json')
+    intervals = []
+    records = {}
+    if os.path.exists(cache_file):
+        with open(cache_file) as f:
+            cache = json.load(f)
+        intervals = [[datetime.strptime(a, form), datetime.strptime(b, form)] for a, b in cache["intervals"]]
+        records = dict(zip(cache["datetime"], zip(cache["index"], cache["status"])))
+
+    missing = __missingintervals__(d1, d2, intervals)
+    if missing:
+        cadence = timedelta(minutes=__cadence__[index])
+        for start, end in missing:
+            settled = None
+            provisional = False
+            for result_t, result_index, result_s in __fetchchunks__(start, end, index, status, retries, timeout, backoff, stats):
+                records.update(zip(result_t, zip(result_index, result_s)))
+                for t, s in zip(result_t, result_s):
+                    if provisional or s not in ['def', None]:
+                        provisional = True
+                        break
+                    settled = t
+            if settled is not None:
+                settled = datetime.strptime(settled, form)
+                if not provisional and settled + cadence > end:
+                    settled = end
+                intervals.append([start, settled])
+        intervals = __mergeintervals__(intervals)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        times = sorted(records)
+        cache = {"intervals": [[a.strftime(form), b.strftime(form)] for a, b in intervals],
+                 "datetime": times,
+                 "index": [records[t][0] for t in times],
+                 "status": [records[t][1] for t in times]}
+        with open(cache_file + '.tmp', 'w') as f:
+            json.dump(cache, f)
+        os.replace(cache_file + '.tmp', cache_file)
+
+    first, last = d1.strftime(form), d2.strftime(form)
+    times = [t for t in sorted(records) if first <= t <= last]
+    return times, [records[t][0] for t in times], [records[t][1] for t in times]
+
+def __toarrays__(result_t, result_index, result_s):
+    """
+    convert downloaded lists in bulk to datetime64[ns] times, float values (nan for missing)
+    and a byte string status array, or None without status
+    """
+    import numpy as np
+
+    # 'yyyy-mm-ddTHH:MM:SSZ' cut to 19 bytes drops the 'Z', which numpy parses as naive UTC
+    times = np.array(result_t, dtype='S19').astype('datetime64[s]').astype('datetime64[ns]')
+    values = np.array(result_index, dtype=float)
+    if result_s is None:
+        return times, values, None
+    return times, values, np.array(result_s, dtype='S')
+
+def __todataframe__(times, values, status, index):
+    """
+    DataFrame with a DatetimeIndex, a float column and a categorical status column
+    """
+    import numpy as np
+    import pandas as pd
+
+    df = pd.DataFrame({index: values}, index=pd.DatetimeIndex(times, name='datetime'))
+    if status is not None:
+        categories, codes = np.unique(status, return_inverse=True)
+        df['status'] = pd.Categorical.from_codes(codes, [c.decode() for c in categories])
+    return df
+
+class KpArchive:
+    """
+    ---------------------------------------------------------------------------------
+    local archive of index data in memory-mapped columnar files, one set of files per index and status:
+    <index>_<status>.time (int64 seconds since 1970), .value (float64) and .status (3 byte strings)
+    update() appends only data newer than the archive, query() finds a time range by binary search
+    example: archive = KpArchive('kp_archive')
+             archive.update('Kp', 'def')
+             (time, index, status) = archive.query('2021-09-29', '2021-10-01', 'Kp', 'def')
+             (time, index, status) = getKpindex('2021-09-29', '2021-10-01', 'Kp', 'def', archive=archive)
+    ---------------------------------------------------------------------------------
+    """
+
+    __columns__ = {'time': 'int64', 'value': 'float64', 'status': 'S3'}
+
+    def __init__(self, path):
+        self.path = path
+        self.__maps__ = {}
+        os.makedirs(path, exist_ok=True)
+
+    def __columnfile__(self, index, status, column):
+        return os.path.join(self.path, index + '_' + status + '.' + column)
+
+    def __columnnames__(self, index):
+        """
+        columns of index in the order update() appends them: time last, so that the time column,
+        which decides where the next update resumes, never gets ahead of the values
+        """
+        if index in ['Hp30', 'Hp60', 'ap30', 'ap60', 'Fobs', 'Fadj']:
+            return ['value', 'time']
+        return ['value', 'status', 'time']
+
+    def __sizes__(self, index, status):
+        """
+        number of complete records in every column file of index and status
+        """
+        import numpy as np
+
+        return [os.path.getsize(self.__columnfile__(index, status, column)) // np.dtype(self.__columns__[column]).itemsize
+                if os.path.exists(self.__columnfile__(index, status, column)) else 0
+                for column in self.__columnnames__(index)]
+
+    def __load__(self, index, status):
+        """
+        memory-maps the columns of index and status, cached until the next update
+        """
+        if (index, status) not in self.__maps__:
+            columns = self.__columnnames__(index)
+            has_status = 'status' in columns
+            import numpy as np
+
+            # an update interrupted between two columns leaves one column longer than the others
+            length = min(self.__sizes__(index, status))
+            maps = {}
+            for column in columns:
+                if length == 0:
+                    maps[column] = np.empty(0, dtype=self.__columns__[column])
+                else:
+                    maps[column] = np.memmap(self.__columnfile__(index, status, column), dtype=self.__columns__[column],
+                                             mode='r', shape=(length,))
+            if not has_status:
+                maps['status'] = None
+            self.__maps__[(index, status)] = maps
+        return self.__maps__[(index, status)]
+
+    def __truncate__(self, index, status, length):
+        import numpy as np
+
+        self.__maps__.pop((index, status), None)
+        for column, dtype in self.__columns__.items():
+            if os.path.exists(self.__columnfile__(index, status, column)):
+                os.truncate(self.__columnfile__(index, status, column), length * np.dtype(dtype).itemsize)
+
+    def update(self, index, status='all', start='1932-01-01', retries=0, timeout=None, backoff=0.5, stats=None, max_workers=4):
+        """
+        download data after the last archived value until now and append it,
+        start is used for an empty archive. Values which are not definitive yet
+        are downloaded again, so that corrected values replace them.
+        returns the number of values appended
+        """
+        import numpy as np
+
+        __checkIndex__(index)
+        __checkstatus__(status)
+        maps = self.__load__(index, status)
+        length = len(maps['time'])
+        if maps['status'] is not None:
+            provisional = np.flatnonzero(maps['status'] != b'def')
+            if len(provisional):
+                length = int(provisional[0])
+        # cut columns left longer by an interrupted update back, before new values are appended to them
+        if any(size != length for size in self.__sizes__(index, status)):
+            self.__truncate__(index, status, length)
+            maps = self.__load__(index, status)
+
+        if length:
+            d1 = datetime(1970, 1, 1) + timedelta(seconds=int(maps['time'][length - 1]) + 1)
+        else:
+            d1 = datetime.strptime(start[:10], '%Y-%m-%d')
+        d2 = datetime.now(timezone.utc).replace(tzinfo=None).replace(microsecond=0)
+        if d1 > d2:
+            return 0
+
+        self.__maps__.pop((index, status), None)
+        appended = 0
+        for result_t, result_index, result_s in __fetchchunks__(d1, d2, index, status, retries, timeout, backoff, stats, max_workers):
+            times, values, status_array = __toarrays__(result_t, result_index, result_s if maps['status'] is not None else None)
+            columns = {'time': times.astype('datetime64[s]').astype('int64'), 'value': values, 'status': status_array}
+            for column in self.__columnnames__(index):
+                with open(self.__columnfile__(index, status, column), 'ab') as f:
+                    columns[column].astype(self.__columns__[column]).tofile(f)
+            appended += len(times)
+        return appended
+
+    def query(self, starttime, endtime, index, status='all'):
+        """
+        values of index between starttime and endtime (inclusive), same date formats as getKpindex
+        returns (time, index, status) as datetime64[ns], float and byte string arrays, status is None for indices without status
+        """
+        import numpy as np
+
+        if len(starttime) == 10 and len(endtime) == 10:
+            starttime = starttime + 'T00:00:00Z'
+            endtime = endtime + 'T23:59:00Z'
+        d1 = datetime.strptime(starttime, '%Y-%m-%dT%H:%M:%SZ')
+        d2 = datetime.strptime(endtime, '%Y-%m-%dT%H:%M:%SZ')
+        __checkdate__(d1, d2)
+        __checkIndex__(index)
+        __checkstatus__(status)
+
+        maps = self.__load__(index, status)
+        epoch = datetime(1970, 1, 1)
+        first = np.searchsorted(maps['time'], int((d1 - epoch).total_seconds()), side='left')
+        last = np.searchsorted(maps['time'], int((d2 - epoch).total_seconds()), side='right')
+        times = maps['time'][first:last].astype('datetime64[s]').astype('datetime64[ns]')
+        values = np.array(maps['value'][first:last])
+        status_array = None if maps['status'] is None else np.array(maps['status'][first:last])
+        return times, values, status_array
+
+def __checkerrors__(errors):
+    if errors not in ['print', 'raise']:
+        raise IndexError("Error! Wrong errors parameter! \nAllowed are only the string parameter: 'print', 'raise'")
+    return True
+
+def getKpindex(starttime, endtime, index, status='all', cache_dir=None, retries=0, timeout=None, backoff=0.5, stats=None, output='tuple', max_workers=4, archive=None, errors='print'):
     """
     ---------------------------------------------------------------------------------
     download 'Kp', 'ap', 'Ap', 'Cp', 'C9', 'Hp30', 'Hp60', 'ap30', 'ap60', 'SN', 'Fobs' or 'Fadj' index data from kp.gfz-potsdam.de
@@ -43,9 +495,25 @@ def getKpindex(starttime, endtime, index, status='all'):
     Hpo index and Fobs/Fadj does not have the status info
     example: (time, index, status) = getKpindex('2021-09-29', '2021-10-01','Ap','def')
     example: (time, index, status) = getKpindex('2021-09-29T12:00:00Z', '2021-10-01T12:00:00Z','Kp')
+    optional cache_dir keeps downloaded data on disk, later calls only download the time ranges not cached yet
+    example: (time, index, status) = getKpindex('2021-09-29', '2021-10-01','Kp', cache_dir='kp_cache')
+    optional retries repeats failed requests (connection errors, timeouts, server errors), timeout is in seconds per request
+    retry n waits a random time up to backoff * 2**n seconds
+    optional stats dict is filled with the number of requests, attempts and retries and the latency of every request
+    example: stats = {}; getKpindex('2021-09-29', '2021-10-01','Kp', retries=3, stats=stats)
+    optional output='numpy' returns (time, index, status) as datetime64[ns], float and byte string arrays
+    optional output='pandas' returns a DataFrame indexed by time with the index and a categorical status column
+    example: df = getKpindex('1985-01-01', '2024-12-31','Hp30', output='pandas')
+    long time ranges are downloaded in windows of __chunkpoints__ values, max_workers windows at a time
+    optional archive (a KpArchive or its directory) reads the data from a local archive instead of downloading it
+    by default errors are printed and (0, 0, 0) is returned, with errors='raise' a KpindexError is raised instead:
+    KpindexRequestError for wrong parameters, KpindexConnectionError when the server can not be reached after all retries,
+    KpindexResponseError when the server rejects the request or the response is not index data
     ---------------------------------------------------------------------------------
     """
-    result_t=0; result_index=0; result_s=0
+    result_t=0; result_index=0; result_s=0; result_df=None
+    __checkerrors__(errors)
+    error = None; url = __url__
 
     if len(starttime) == 10 and len(endtime) == 10:
         starttime = starttime + 'T00:00:00Z'
@@ -58,34 +526,110 @@ def getKpindex(starttime, endtime, index, status='all'):
         __checkdate__(d1,d2)
         __checkIndex__(index)  
         __checkstatus__(status)
+        __checkoutput__(output)
+
+        url = __buildurl__(d1, d2, index, status)
+
+        has_status = index not in ['Hp30', 'Hp60', 'ap30', 'ap60', 'Fobs', 'Fadj']
+        if archive is not None:
+            if not isinstance(archive, KpArchive):
+                archive = KpArchive(archive)
+            chunks = [archive.query(starttime, endtime, index, status)]
+        elif cache_dir is None:
+            chunks = __fetchchunks__(d1, d2, index, status, retries, timeout, backoff, stats, max_workers)
+        else:
+            chunks = [__cachedfetch__(d1, d2, index, status, cache_dir, retries, timeout, backoff, stats)]
+
+        if output == 'tuple':
+            data_t, data_index, data_s = [], [], []
+            for chunk_t, chunk_index, chunk_s in chunks:
+                if archive is not None:
+                    import numpy as np
+
+                    chunk_t = np.char.add(np.datetime_as_string(chunk_t, unit='s'), 'Z').tolist()
+                    chunk_index = chunk_index.tolist()
+                    chunk_s = np.char.decode(chunk_s).tolist() if has_status else []
+                data_t.extend(chunk_t)
+                data_index.extend(chunk_index)
+                data_s.extend(chunk_s)
+            result_t = tuple(data_t)
+            result_index = tuple(data_index)
+            if has_status:
+                result_s = tuple(data_s)
+        else:
+            import numpy as np
 
-        time_string = "start=" + d1.strftime('%Y-%m-%dT%H:%M:%SZ') + "&end=" + d2.strftime('%Y-%m-%dT%H:%M:%SZ')
-        url = 'https://kp.gfz-potsdam.de/app/json/?' + time_string  + "&index=" + index
-        if index not in ['Hp30', 'Hp60', 'ap30', 'ap60', 'Fobs', 'Fadj']:
-            url = __addstatus__(url, status)
-
-        webURL = urllib.request.urlopen(url)
-        binary = webURL.read()
-        text=binary.decode('utf-8')
-    
-        try:
-            data = json.loads(text)
-            result_t = tuple(data["datetime"])
-            result_index = tuple(data[index])
-            if index not in ['Hp30', 'Hp60', 'ap30', 'ap60', 'Fobs', 'Fadj']:
-                result_s = tuple(data["status"])
-        except:
-            print(text)
+            # every window is converted to arrays as soon as it is downloaded, the archive already returns arrays
+            arrays = [chunk if archive is not None else __toarrays__(chunk[0], chunk[1], chunk[2] if has_status else None)
+                      for chunk in chunks]
+            times = np.concatenate([a[0] for a in arrays])
+            values = np.concatenate([a[1] for a in arrays])
+            status_array = np.concatenate([a[2] for a in arrays]) if has_status else None
+            if output == 'pandas':
+                result_df = __todataframe__(times, values, status_array, index)
+            else:
+                result_t, result_index = times, values
+                if has_status:
+                    result_s = status_array
 
+    except json.JSONDecodeError as er:
+        error = KpindexResponseError(er.doc)
+        error.__cause__ = er
     except NameError as er:
-        print(er)
+        error = KpindexRequestError(str(er))
+        error.__cause__ = er
     except IndexError as er:
-        print(er)
-    except ValueError:
-        print("Error! Wrong datetime string")
-        print("Both dates must be the same format.")
-        print("Datetime strings must be in format yyyy-mm-dd or yyyy-mm-ddTHH:MM:SSZ")
-    except urllib.error.URLError:
-        print("Connection Error\nCan not reach " + url)
+        error = KpindexRequestError(str(er))
+        error.__cause__ = er
+    except ValueError as er:
+        error = KpindexRequestError("Error! Wrong datetime string\n"
+                                    "Both dates must be the same format.\n"
+                                    "Datetime strings must be in format yyyy-mm-dd or yyyy-mm-ddTHH:MM:SSZ")
+        error.__cause__ = er
+    except urllib.error.URLError as er:
+        if isinstance(er, urllib.error.HTTPError) and not __transient__(er.code):
+            error = KpindexResponseError("Error! Request rejected with HTTP " + str(er.code) + "\n" + url)
+        else:
+            error = KpindexConnectionError("Connection Error\nCan not reach " + url)
+        error.__cause__ = er
+    except Exception as er:
+        error = er
     finally:
+        if error is not None:
+            if errors == 'raise':
+                raise error
+            print(error)
+        if result_df is not None:
+            return result_df
         return result_t, result_index, result_s
+
+def getKpindices(starttime, endtime, indices, status='all', cache_dir=None, retries=0, timeout=None, backoff=0.5, stats=None, output='tuple', max_workers=None, archive=None, errors='print'):
+    """
+    ---------------------------------------------------------------------------------
+    download several indices for the same time range with concurrent requests
+    indices is a list of 'Kp', 'ap', 'Ap', 'Cp', 'C9', 'Hp30', 'Hp60', 'ap30', 'ap60', 'SN', 'Fobs' or 'Fadj'
+    starttime, endtime, status, cache_dir, retries, timeout, backoff, stats, output, archive and errors are the same as for getKpindex
+    max_workers is the number of concurrent requests, by default one per index
+    returns a dict with one getKpindex result per index, in the order of indices
+    example: data = getKpindices('2021-09-29', '2021-10-01', ['Kp', 'ap', 'Hp30'])
+             (time, index, status) = data['Kp']
+    ---------------------------------------------------------------------------------
+    """
+    indices = list(dict.fromkeys(indices))
+    try:
+        for index in indices:
+            __checkIndex__(index)
+        __checkstatus__(status)
+        __checkoutput__(output)
+        __checkerrors__(errors)
+    except IndexError as er:
+        if errors == 'raise':
+            raise KpindexRequestError(str(er)) from er
+        print(er)
+        return {}
+
+    with ThreadPoolExecutor(max_workers=max_workers or max(len(indices), 1)) as executor:
+        futures = {index: executor.submit(getKpindex, starttime, endtime, index, status, cache_dir, retries, timeout, backoff,
+                                          stats, output, archive=archive, errors=errors)
+                   for index in indices}
+    return {index: future.result() for index, future in futures.items()}
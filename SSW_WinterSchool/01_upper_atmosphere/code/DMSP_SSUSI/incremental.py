@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+MANIFEST_NAME = ".manifest.json"
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class Manifest:
+    """Make-style bookkeeping of which inputs and parameters every output was built from.
+
+    An output is up to date when it was recorded as built with the same inputs and
+    parameters, and is newer than all of its inputs or the inputs have the same
+    content (SHA-256) as when it was built. Outputs without a record, e.g. left
+    behind by a failed build, are always rebuilt. The manifest is a JSON file in
+    `directory`, paths are stored relative to it.
+    """
+
+    def __init__(self, directory, force=False):
+        self.directory = Path(directory)
+        self.path = self.directory / MANIFEST_NAME
+        self.force = force
+        self.entries = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                self.entries = json.load(f)
+
+    def _key(self, path):
+        return os.path.relpath(path, self.directory)
+
+    def is_up_to_date(self, inputs, output, params=None):
+        if self.force or not Path(output).exists():
+            return False
+        entry = self.entries.get(self._key(output))
+        if entry is None or "inputs" not in entry:
+            return False
+        names = [self._key(path) for path in inputs]
+        # A pass added to or removed from a movie changes the inputs, not their mtimes
+        if set(entry["inputs"]) != set(names) or entry.get("params", {}) != (params or {}):
+            return False
+
+        output_mtime = os.stat(output).st_mtime
+        if all(os.stat(path).st_mtime <= output_mtime for path in inputs):
+            return True
+        # Newer inputs may just have been copied again, only rebuild if the content changed
+        unchanged = all(os.stat(path).st_size == entry["inputs"][name]["size"]
+                        and file_hash(path) == entry["inputs"][name]["sha256"]
+                        for path, name in zip(inputs, names))
+        if unchanged:
+            # Touch the output so the next check is a plain mtime comparison again
+            os.utime(output)
+        return unchanged
+
+    def record(self, inputs, output, params=None):
+        self.entries[self._key(output)] = {
+            "inputs": {self._key(path): {"size": os.stat(path).st_size, "sha256": file_hash(path)}
+                       for path in inputs},
+            "params": params or {},
+        }
+
+    def save(self):
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f, indent=1)
+        os.replace(tmp, self.path)
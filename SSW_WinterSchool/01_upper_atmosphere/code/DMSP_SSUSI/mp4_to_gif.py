@@ -1,25 +1,103 @@
-from moviepy.video.io.VideoFileClip import VideoFileClip
+import cv2
+import numpy as np
+from PIL import Image
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import argparse
 
+from incremental import Manifest
+
+def moviepy_to_gif(mp4_file, output_gif, fps=10, width=None):
+    from moviepy.video.io.VideoFileClip import VideoFileClip
+
+    # Load video clip
+    clip = VideoFileClip(mp4_file)
+
+    # Resize the clip (optional, adjust width to reduce size)
+    if width:
+        clip = clip.resized(width=width) # Change width as needed
+
+    # Write the GIF file
+    clip.write_gif(output_gif, fps=fps)  # Adjust FPS if needed
+
+def read_frames(mp4_file, fps=10, width=None):
+    """Decode only the frames needed for a GIF at fps, resized to width, as RGB arrays"""
+    capture = cv2.VideoCapture(str(mp4_file))
+    source_fps = capture.get(cv2.CAP_PROP_FPS) or fps
+    frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    # A GIF can not be faster than its source, every frame is used then
+    step = max(source_fps / fps, 1.0)
+    wanted = set(np.floor(np.arange(0, frame_count, step)).astype(int).tolist())
+
+    frames = []
+    for index in range(frame_count):
+        # grab() only demuxes and decodes, retrieve() converts to BGR, skipped frames are never converted
+        if not capture.grab():
+            break
+        if index not in wanted:
+            continue
+        ok, frame = capture.retrieve()
+        if not ok:
+            break
+        if width:
+            height = round(frame.shape[0] * width / frame.shape[1])
+            frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    capture.release()
+    return frames, min(fps, source_fps)
+
+def frames_to_gif(frames, output_gif, fps=10, sample=16):
+    """Write RGB frames as a GIF with one palette for the whole clip
+
+    The palette is computed once from up to `sample` frames, every frame is then
+    mapped onto it, instead of building a new palette per frame.
+    """
+    if not frames:
+        raise ValueError("No frames to write")
+    sampled = frames[::max(len(frames) // sample, 1)]
+    palette = Image.fromarray(np.concatenate(sampled, axis=0)).quantize(colors=256, method=Image.Quantize.MEDIANCUT)
+    images = [Image.fromarray(frame).quantize(palette=palette, dither=Image.Dither.NONE) for frame in frames]
+    images[0].save(output_gif, save_all=True, append_images=images[1:], duration=round(1000 / fps), loop=0)
+
+def mp4_to_gif(mp4_file, output_gif, fps=10, width=None):
+    frames, gif_fps = read_frames(mp4_file, fps, width)
+    frames_to_gif(frames, output_gif, gif_fps)
+    print(f"GIF saved as {output_gif}")
+
+def _mp4_to_gif_job(job):
+    mp4_file, output_gif, fps, width, direct = job
+    if direct:
+        mp4_to_gif(mp4_file, output_gif, fps, width)
+    else:
+        moviepy_to_gif(mp4_file, output_gif, fps, width)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--input_dir", type=str, default="")
     parser.add_argument("--width", type=int, default=None)
+    parser.add_argument("--fps", type=int, default=10)
+    parser.add_argument("--force", action="store_true", help="convert all files, also up-to-date ones")
+    parser.add_argument("--direct", action="store_true",
+                        help="decode only the needed frames with OpenCV and write with one palette per clip instead of moviepy")
+    parser.add_argument("--jobs", type=int, default=1, help="number of files converted at once")
     args = parser.parse_args()
 
     input_dir = Path(args.input_dir)
+    manifest = Manifest(input_dir, force=args.force)
+    params = {"fps": args.fps, "width": args.width, "direct": args.direct}
 
+    jobs = []
     mp4_files = sorted(Path(input_dir).glob("*.mp4"))
     for mp4_file in mp4_files:
-        # Load video clip
-        clip = VideoFileClip(mp4_file)
-
-        # Resize the clip (optional, adjust width to reduce size)
-        if args.width:
-            clip = clip.resized(width=args.width) # Change width as needed
-
         output_gif = mp4_file.with_suffix(".gif")
+        if manifest.is_up_to_date([mp4_file], output_gif, params):
+            print(f"{output_gif} is up to date")
+            continue
+        jobs.append((mp4_file, output_gif, args.fps, args.width, args.direct))
 
-    # Write the GIF file
-        clip.write_gif(output_gif, fps=10)  # Adjust FPS if needed
\ No newline at end of file
+    try:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            for job, _ in zip(jobs, executor.map(_mp4_to_gif_job, jobs)):
+                manifest.record([job[0]], job[1], params)
+    finally:
+        manifest.save()
@@ -1,30 +1,83 @@
 import fitz  # PyMuPDF
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import argparse
+import sys
 
-def pdf_to_png(pdf_path, png_path):
+from incremental import Manifest
+
+def page_png_path(png_path, page_number, page_count):
+    # Single-page documents keep their plain name, multi-page ones get one file per page
+    png_path = Path(png_path)
+    if page_count == 1:
+        return png_path
+    return png_path.with_name(f"{png_path.stem}_p{page_number + 1:03d}.png")
+
+def pdf_to_png(pdf_path, png_path, dpi=None, zoom=None):
+    """Rasterize every page of pdf_path, return the written PNG paths
+
+    dpi sets the resolution (PyMuPDF default 72), zoom scales both axes
+    with a fitz.Matrix instead.
+    """
     pdf_document = fitz.open(pdf_path)
-    assert len(pdf_document) == 1
-    page = pdf_document.load_page(0)
-    pix = page.get_pixmap()
-    pix.save(png_path)
-    print(f"Saved: {png_path}")
+    matrix = fitz.Matrix(zoom, zoom) if zoom else None
+    png_paths = []
+    for page_number in range(len(pdf_document)):
+        page = pdf_document.load_page(page_number)
+        pix = page.get_pixmap(matrix=matrix, dpi=dpi) if matrix else page.get_pixmap(dpi=dpi)
+        page_path = page_png_path(png_path, page_number, len(pdf_document))
+        pix.save(page_path)
+        print(f"Saved: {page_path}")
+        png_paths.append(page_path)
 
     pdf_document.close()
+    return png_paths
+
+def _pdf_to_png_job(job):
+    pdf_file, dpi, zoom = job
+    return pdf_to_png(pdf_file, pdf_file.with_suffix(".png"), dpi, zoom)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--input_dir", type=str, default="")
+    parser.add_argument("--force", action="store_true", help="convert all files, also up-to-date ones")
+    parser.add_argument("--dpi", type=int, default=None, help="resolution of the PNGs, PyMuPDF default is 72")
+    parser.add_argument("--zoom", type=float, default=None, help="scale factor of the page matrix, instead of --dpi")
+    parser.add_argument("--jobs", type=int, default=1, help="number of worker processes")
     args = parser.parse_args()
 
     input_dir = Path(args.input_dir)
+    manifest = Manifest(input_dir, force=args.force)
+    params = {"dpi": args.dpi, "zoom": args.zoom}
 
     pdf_files = list(input_dir.glob("*.pdf"))
     print(len(pdf_files))
 
-    for pdf_file in pdf_files:
-        png_file = pdf_file.with_suffix(".png")
-        pdf_to_png(pdf_file, png_file)
+    todo = [pdf_file for pdf_file in pdf_files
+            if not (manifest.is_up_to_date([pdf_file], pdf_file.with_suffix(".png"), params)
+                    or manifest.is_up_to_date([pdf_file], page_png_path(pdf_file.with_suffix(".png"), 0, 2), params))]
+    failures = {}
+    try:
+        with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            # One future per file, so an unreadable PDF only fails itself
+            futures = {pdf_file: executor.submit(_pdf_to_png_job, (pdf_file, args.dpi, args.zoom)) for pdf_file in todo}
+            for pdf_file, future in futures.items():
+                try:
+                    png_paths = future.result()
+                except Exception as error:
+                    failures[pdf_file] = error
+                    continue
+                for png_path in png_paths:
+                    manifest.record([pdf_file], png_path, params)
+    finally:
+        manifest.save()
+    print(f"Skipped {len(pdf_files) - len(todo)} up-to-date files")
+
+    print(f"{len(failures)} of {len(pdf_files)} files failed")
+    for pdf_file, error in failures.items():
+        print(f"Failed: {pdf_file}: {error}")
+    if failures:
+        sys.exit(1)
 
 # eventdoys = ["2024083", "2024084", "2024085"]
 
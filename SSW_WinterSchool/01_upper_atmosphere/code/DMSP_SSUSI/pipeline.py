@@ -0,0 +1,171 @@
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+import argparse
+import sys
+import time
+
+from incremental import Manifest
+from mp4_to_gif import mp4_to_gif
+from pdf_to_png import pdf_to_png
+from png_to_mp4 import SSUSI_PNG, images_to_video
+from ps_to_pdf import ps_to_pdf
+
+# ps -> pdf -> png run per file, mp4 joins all PNGs of a (satellite, DOY) group, gif follows its mp4
+STAGES = ["pdf", "png", "mp4", "gif"]
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+class StageStats:
+    def __init__(self):
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.first_submit = None
+        self.last_done = None
+
+    def summary(self):
+        span = (self.last_done - self.first_submit) if self.done else 0.0
+        latency = self.busy / self.done if self.done else 0.0
+        throughput = self.done / span if span else 0.0
+        return (f"{self.done:>6} {self.skipped:>8} {self.failed:>7} "
+                f"{latency:>12.3f} {throughput:>14.2f}")
+
+class Pipeline:
+    """Run ps -> pdf -> png -> mp4 -> gif for every SSUSI file below input_dir
+
+    Every stage has its own process pool. A file moves to the next stage as soon as
+    it is done, so PNGs of one pass are rendered while later passes are still
+    converted to PDF. Outputs that are up to date according to the manifest of
+    their directory are not rebuilt.
+    """
+
+    def __init__(self, input_dir, jobs=2, fps=5, gif_fps=10, width=None, dpi=None, force=False):
+        self.input_dir = Path(input_dir)
+        self.jobs = jobs
+        self.fps = fps
+        self.gif_fps = gif_fps
+        self.width = width
+        self.dpi = dpi
+        self.force = force
+        self.manifests = {}
+        self.stats = {stage: StageStats() for stage in STAGES}
+        self.failures = {}
+        self.running = {}
+
+    def manifest(self, output):
+        directory = Path(output).parent
+        if directory not in self.manifests:
+            self.manifests[directory] = Manifest(directory, force=self.force)
+        return self.manifests[directory]
+
+    def submit(self, stage, key, inputs, output, params, func, *args, **kwargs):
+        stats = self.stats[stage]
+        if self.manifest(output).is_up_to_date(inputs, output, params):
+            stats.skipped += 1
+            self.finished(stage, key, True)
+            return
+        if stats.first_submit is None:
+            stats.first_submit = time.perf_counter()
+        future = self.pools[stage].submit(_timed, func, *args, **kwargs)
+        self.running[future] = (stage, key, inputs, output, params)
+
+    def finished(self, stage, key, ok):
+        if stage == "pdf":
+            pdf_file = key.with_suffix(".pdf")
+            if ok:
+                png_file = key.with_suffix(".png")
+                self.submit("png", key, [pdf_file], png_file, {"dpi": self.dpi, "zoom": None},
+                            pdf_to_png, pdf_file, png_file, self.dpi)
+            else:
+                self.finished("png", key, False)
+        elif stage == "png":
+            group = self.group_of.get(key)
+            if group is None:
+                return
+            if not ok:
+                self.failed_groups.add(group)
+            self.pending_pngs[group].discard(key)
+            if not self.pending_pngs[group] and group not in self.failed_groups:
+                sat, doy = group
+                png_files = [ps_file.with_suffix(".png") for ps_file in self.groups[group]]
+                mp4_file = self.movie_dir[group] / f"{doy}_{sat}.mp4"
+                self.submit("mp4", mp4_file, png_files, mp4_file, {"fps": self.fps},
+                            images_to_video, png_files, mp4_file, self.fps, progress_bar=False)
+        elif stage == "mp4" and ok:
+            gif_file = key.with_suffix(".gif")
+            self.submit("gif", gif_file, [key], gif_file, {"fps": self.gif_fps, "width": self.width, "direct": True},
+                        mp4_to_gif, key, gif_file, self.gif_fps, self.width)
+
+    def run(self):
+        ps_files = sorted(self.input_dir.rglob("*.ps"))
+        self.groups = defaultdict(list)
+        self.group_of = {}
+        for ps_file in ps_files:
+            match = SSUSI_PNG.match(ps_file.name)
+            if match:
+                self.groups[match.groups()].append(ps_file)
+                self.group_of[ps_file] = match.groups()
+        self.pending_pngs = {group: set(files) for group, files in self.groups.items()}
+        self.failed_groups = set()
+        self.movie_dir = {}
+        for group, files in self.groups.items():
+            directories = {ps_file.parent for ps_file in files}
+            self.movie_dir[group] = directories.pop() if len(directories) == 1 else self.input_dir
+        print(f"{len(ps_files)} PostScript files, {len(self.groups)} movies")
+
+        self.pools = {stage: ProcessPoolExecutor(max_workers=self.jobs) for stage in STAGES}
+        try:
+            for ps_file in ps_files:
+                pdf_file = ps_file.with_suffix(".pdf")
+                self.submit("pdf", ps_file, [ps_file], pdf_file, None, ps_to_pdf, ps_file, pdf_file)
+
+            while self.running:
+                done, _ = wait(self.running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, key, inputs, output, params = self.running.pop(future)
+                    stats = self.stats[stage]
+                    stats.last_done = time.perf_counter()
+                    try:
+                        stats.busy += future.result()
+                        stats.done += 1
+                        self.manifest(output).record(inputs, output, params)
+                        ok = True
+                    except Exception as error:
+                        stats.failed += 1
+                        self.failures[(stage, str(key))] = error
+                        ok = False
+                    self.finished(stage, key, ok)
+        finally:
+            for pool in self.pools.values():
+                pool.shutdown()
+            for manifest in self.manifests.values():
+                manifest.save()
+
+    def report(self):
+        print(f"{'stage':>5} {'done':>6} {'skipped':>8} {'failed':>7} {'latency [s]':>12} {'throughput/s':>14}")
+        for stage in STAGES:
+            print(f"{stage:>5} {self.stats[stage].summary()}")
+        for (stage, key), error in self.failures.items():
+            print(f"Failed {stage}: {key}: {error}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input_dir", type=str, default="")
+    parser.add_argument("--jobs", type=int, default=2, help="number of worker processes per stage")
+    parser.add_argument("--fps", type=int, default=5, help="frame rate of the movies")
+    parser.add_argument("--gif_fps", type=int, default=10)
+    parser.add_argument("--width", type=int, default=None, help="width of the GIFs")
+    parser.add_argument("--dpi", type=int, default=None, help="resolution of the PNGs, PyMuPDF default is 72")
+    parser.add_argument("--force", action="store_true", help="rebuild all outputs, also up-to-date ones")
+    args = parser.parse_args()
+
+    pipeline = Pipeline(args.input_dir, args.jobs, args.fps, args.gif_fps, args.width, args.dpi, args.force)
+    pipeline.run()
+    pipeline.report()
+    if pipeline.failures:
+        sys.exit(1)
@@ -1,31 +1,130 @@
 import cv2
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
 import argparse
+import json
+import os
+import re
+import sys
+import time
 from tqdm import tqdm
 
-def images_to_video(images, output_file, fps=30):
+from incremental import Manifest
+
+def read_frame(image, size=None):
+    frame = cv2.imread(str(image))
+    if frame is None:
+        raise ValueError(f"Could not read image {image}")
+    # VideoWriter silently drops frames whose size differs from the video size
+    if size is not None and (frame.shape[1], frame.shape[0]) != size:
+        frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    return frame
+
+def images_to_video(images, output_file, fps=30, workers=4, prefetch=16, progress_bar=True):
     # Get the list of image files
     # images = sorted([img for img in os.listdir(image_folder) if img.endswith(".png")])
     if not images:
         raise ValueError("No PNG images found in the specified folder.")
     
     # Get dimensions of the first image
-    first_image_path = images[0]
-    frame = cv2.imread(first_image_path)
-    height, width, layers = frame.shape
+    first_frame = read_frame(images[0])
+    height, width, layers = first_frame.shape
     
     # Define the video codec and create a VideoWriter object
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    video = cv2.VideoWriter(output_file, fourcc, fps, (width, height))
-    
-    # Add images to the video
-    for image in tqdm(images):
-        frame = cv2.imread(image)
-        video.write(frame)
+    # Encode into a temporary file next to the output, which only replaces the output once
+    # every frame is written, so a failed run never leaves a truncated movie behind
+    output_file = Path(output_file)
+    tmp_file = output_file.with_name(f"{output_file.stem}.tmp{output_file.suffix}")
+    video = cv2.VideoWriter(str(tmp_file), fourcc, fps, (width, height))
     
+    # Decode up to prefetch frames ahead on a thread pool (cv2 releases the GIL)
+    # while this thread encodes them in order. At least one frame is always queued,
+    # otherwise nothing after the first frame would be read
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            remaining = iter(images[1:])
+            pending = deque(executor.submit(read_frame, image, (width, height))
+                            for image in islice(remaining, max(prefetch, 1)))
+
+            video.write(first_frame)
+            with tqdm(total=len(images), initial=1, disable=not progress_bar) as progress:
+                while pending:
+                    frame = pending.popleft().result()
+                    image = next(remaining, None)
+                    if image is not None:
+                        pending.append(executor.submit(read_frame, image, (width, height)))
+                    video.write(frame)
+                    progress.update()
+    except BaseException:
+        video.release()
+        tmp_file.unlink(missing_ok=True)
+        raise
+
     # Release the VideoWriter object
     video.release()
+    os.replace(tmp_file, output_file)
     print(f"Video saved as {output_file}")
+    return len(images)
+
+# Product names look like SSUSIF17_2024084R089714_00_LBHS.png
+SSUSI_PNG = re.compile(r"SSUSI(F\d+)_(\d{7})R")
+
+def find_movies(input_dir):
+    """Group all SSUSI PNGs below input_dir by (satellite, DOY) in a single directory walk
+
+    Returns {(sat, doy): (output_file, png_files)}, the movie is written next to its frames.
+    """
+    groups = defaultdict(list)
+    for dirpath, dirnames, filenames in os.walk(input_dir):
+        for filename in filenames:
+            match = SSUSI_PNG.match(filename)
+            if match and filename.endswith(".png"):
+                groups[match.groups()].append(Path(dirpath) / filename)
+    movies = {}
+    for (sat, doy), png_files in sorted(groups.items()):
+        directories = {png_file.parent for png_file in png_files}
+        output_dir = directories.pop() if len(directories) == 1 else Path(input_dir)
+        movies[(sat, doy)] = (output_dir / f"{doy}_{sat}.mp4", sorted(png_files))
+    return movies
+
+def _build_movie(job):
+    png_files, output_file, fps, workers, prefetch = job
+    start = time.perf_counter()
+    frames = images_to_video(png_files, output_file, fps, workers, prefetch, progress_bar=False)
+    elapsed = time.perf_counter() - start
+    return {"frames": frames, "duration": frames / fps, "elapsed": elapsed, "frames_per_second": frames / elapsed}
+
+def build_movies(input_dir, fps=5, jobs=1, workers=4, prefetch=16, force=False):
+    """Build one movie per (satellite, DOY) below input_dir, jobs movies at a time
+
+    Returns a report with frames, video duration and build throughput of every movie.
+    """
+    movies = find_movies(input_dir)
+    manifests = {}
+    todo = {}
+    report = {}
+    for (sat, doy), (output_file, png_files) in movies.items():
+        manifest = manifests.setdefault(output_file.parent, Manifest(output_file.parent, force=force))
+        if manifest.is_up_to_date(png_files, output_file, {"fps": fps}):
+            report[f"{doy}_{sat}"] = {"output": str(output_file), "frames": len(png_files), "skipped": True}
+        else:
+            todo[(sat, doy)] = (png_files, output_file, fps, workers, prefetch)
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {key: executor.submit(_build_movie, job) for key, job in todo.items()}
+        for (sat, doy), future in futures.items():
+            png_files, output_file = todo[(sat, doy)][:2]
+            try:
+                report[f"{doy}_{sat}"] = {"output": str(output_file), **future.result()}
+                manifests[output_file.parent].record(png_files, output_file, {"fps": fps})
+            except Exception as error:
+                report[f"{doy}_{sat}"] = {"output": str(output_file), "error": str(error)}
+    for manifest in manifests.values():
+        manifest.save()
+    return report
 
 # Usage
 
@@ -35,9 +134,23 @@ if __name__ == "__main__":
     parser.add_argument("--doy", type=str, default=None, required=False)
     parser.add_argument("--sat", type=str, default=None, required=False)
     parser.add_argument("--fps", type=int, default=5)
+    parser.add_argument("--force", action="store_true", help="rebuild the video even if it is up to date")
+    parser.add_argument("--workers", type=int, default=4, help="number of decoder threads")
+    parser.add_argument("--prefetch", type=int, default=16, help="maximum number of decoded frames waiting to be encoded")
+    parser.add_argument("--batch", action="store_true", help="build a movie for every satellite and DOY found below input_dir")
+    parser.add_argument("--jobs", type=int, default=1, help="number of movies built at once in --batch mode")
+    parser.add_argument("--report", type=str, default=None, help="JSON report of --batch mode, default input_dir/movies.json")
     args = parser.parse_args()
 
     input_dir = Path(args.input_dir)
+
+    if args.batch:
+        report = build_movies(input_dir, args.fps, args.jobs, args.workers, args.prefetch, args.force)
+        report_file = Path(args.report) if args.report else input_dir / "movies.json"
+        with open(report_file, "w") as f:
+            json.dump(report, f, indent=1)
+        print(f"{len(report)} movies, report saved as {report_file}")
+        sys.exit(int(any("error" in movie for movie in report.values())))
     
     sat = args.sat
     doy = args.doy 
@@ -48,7 +161,13 @@ if __name__ == "__main__":
         png_files = sorted(input_dir.glob("*.png"))
         output_file = input_dir / "output.mp4"
     print(len(png_files))
-    images_to_video(png_files, output_file, args.fps)
+    manifest = Manifest(input_dir, force=args.force)
+    if manifest.is_up_to_date(png_files, output_file, {"fps": args.fps}):
+        print(f"{output_file} is up to date")
+    else:
+        images_to_video(png_files, output_file, args.fps, args.workers, args.prefetch)
+        manifest.record(png_files, output_file, {"fps": args.fps})
+        manifest.save()
 
 
 # eventdoys = ["2024083", "2024084", "2024085"]
@@ -1,10 +1,49 @@
-import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import argparse
+import sys
+
+from incremental import Manifest
+
+def ps_to_pdf(ps_file, pdf_file):
+    # No shell, so file names with spaces or quotes are passed through unchanged
+    result = subprocess.run(["ps2pdf", str(ps_file), str(pdf_file)], capture_output=True, text=True)
+    if result.returncode != 0:
+        # Do not leave a partial PDF that looks like a finished one
+        Path(pdf_file).unlink(missing_ok=True)
+        raise RuntimeError(result.stderr.strip() or f"ps2pdf exited with code {result.returncode}")
+    print(ps_file, pdf_file)
+
+def convert_all(ps_files, output_dir, jobs=1, manifest=None):
+    """Convert ps_files into output_dir with up to jobs ps2pdf processes, return {ps_file: error}
+
+    With a manifest, files whose PDF is up to date are skipped and new PDFs are recorded.
+    """
+    failures = {}
+    pdf_files = {ps_file: output_dir / ps_file.with_suffix(".pdf").name for ps_file in ps_files}
+    if manifest is not None:
+        pdf_files = {ps_file: pdf_file for ps_file, pdf_file in pdf_files.items()
+                     if not manifest.is_up_to_date([ps_file], pdf_file)}
+        print(f"Skipped {len(ps_files) - len(pdf_files)} up-to-date files")
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {ps_file: executor.submit(ps_to_pdf, ps_file, pdf_file) for ps_file, pdf_file in pdf_files.items()}
+        for ps_file, future in futures.items():
+            try:
+                future.result()
+                if manifest is not None:
+                    manifest.record([ps_file], pdf_files[ps_file])
+            except Exception as error:
+                failures[ps_file] = error
+    if manifest is not None:
+        manifest.save()
+    return failures
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--input_dir", type=str, default="")
+    parser.add_argument("--jobs", type=int, default=1, help="number of concurrent ps2pdf processes")
+    parser.add_argument("--force", action="store_true", help="convert all files, also up-to-date ones")
     args = parser.parse_args()
 
     input_dir = Path(args.input_dir)
@@ -12,11 +51,13 @@ if __name__ == "__main__":
     ps_files = sorted(input_dir.glob("*.ps"))
     print(len(ps_files))
 
-    for ps_file in ps_files:
-        pdf_file = ps_file.with_suffix(".pdf").name
-        pdf_file = input_dir / pdf_file
-        os.system(f"ps2pdf {ps_file} {pdf_file}")
-        print(ps_file, pdf_file)
+    failures = convert_all(ps_files, input_dir, args.jobs, Manifest(input_dir, force=args.force))
+
+    print(f"{len(failures)} of {len(ps_files)} files failed")
+    for ps_file, error in failures.items():
+        print(f"Failed: {ps_file}: {error}")
+    if failures:
+        sys.exit(1)
 
     # eventdoys = ["2024083", "2024084", "2024085"]
 
@@ -0,0 +1,125 @@
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from incremental import Manifest
+
+def gs_command(device, dpi, output, ps_files):
+    return ["gs", "-dSAFER", "-dBATCH", "-dNOPAUSE", "-dQUIET",
+            f"-sDEVICE={device}", f"-r{dpi}", "-dTextAlphaBits=4", "-dGraphicsAlphaBits=4",
+            f"-sOutputFile={output}", *[str(ps_file) for ps_file in ps_files]]
+
+def run_gs(command, output=None):
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        # Do not leave a partial image that looks like a finished one
+        if output is not None:
+            Path(output).unlink(missing_ok=True)
+        raise RuntimeError(result.stderr.decode(errors="replace").strip() or f"gs exited with code {result.returncode}")
+    return result.stdout
+
+def ps_to_png(ps_files, png_files, dpi=72):
+    """Rasterize single-page PostScript files to PNG with one Ghostscript process for the whole batch
+
+    Ghostscript numbers the pages of all inputs consecutively. If the batch fails or does
+    not give exactly one page per file, every file is rendered on its own instead, so
+    only the broken files fail. Returns {ps_file: error} for the files that failed.
+    """
+    with tempfile.TemporaryDirectory(dir=Path(png_files[0]).parent) as tmp_dir:
+        try:
+            run_gs(gs_command("png16m", dpi, os.path.join(tmp_dir, "page_%06d.png"), ps_files))
+            pages = sorted(Path(tmp_dir).glob("page_*.png"))
+        except RuntimeError:
+            pages = []
+        if len(pages) == len(ps_files):
+            for page, png_file in zip(pages, png_files):
+                os.replace(page, png_file)
+                print(f"Saved: {png_file}")
+            return {}
+
+    failures = {}
+    for ps_file, png_file in zip(ps_files, png_files):
+        try:
+            run_gs(gs_command("png16m", dpi, png_file, [ps_file]), png_file)
+            print(f"Saved: {png_file}")
+        except Exception as error:
+            failures[ps_file] = error
+    return failures
+
+def ps_to_arrays(ps_files, dpi=72):
+    """Rasterize PostScript files in memory, return one (height, width, 3) uint8 array per page
+
+    Ghostscript writes raw PPM images to stdout, nothing touches the disk.
+    """
+    data = run_gs(gs_command("ppmraw", dpi, "%stdout", ps_files))
+    images = []
+    offset = 0
+    while offset < len(data):
+        # PPM header: "P6" width height maxval, separated by whitespace, then the pixels.
+        # "#" starts a comment up to the end of the line, Ghostscript writes one after "P6"
+        fields = []
+        while len(fields) < 4:
+            while data[offset:offset + 1].isspace() or data[offset:offset + 1] == b"#":
+                if data[offset:offset + 1] == b"#":
+                    offset = data.index(b"\n", offset)
+                offset += 1
+            end = offset
+            while not data[end:end + 1].isspace():
+                end += 1
+            fields.append(data[offset:end])
+            offset = end
+        offset += 1
+        width, height = int(fields[1]), int(fields[2])
+        size = width * height * 3
+        images.append(np.frombuffer(data, dtype=np.uint8, count=size, offset=offset).reshape(height, width, 3))
+        offset += size
+    return images
+
+def batches(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input_dir", type=str, default="")
+    parser.add_argument("--dpi", type=int, default=72, help="72 gives the same size as ps_to_pdf.py + pdf_to_png.py")
+    parser.add_argument("--batch_size", type=int, default=50, help="number of files per Ghostscript process")
+    parser.add_argument("--jobs", type=int, default=1, help="number of concurrent Ghostscript processes")
+    parser.add_argument("--force", action="store_true", help="convert all files, also up-to-date ones")
+    args = parser.parse_args()
+
+    input_dir = Path(args.input_dir)
+    manifest = Manifest(input_dir, force=args.force)
+
+    ps_files = sorted(input_dir.glob("*.ps"))
+    print(len(ps_files))
+
+    params = {"dpi": args.dpi}
+    todo = [ps_file for ps_file in ps_files if not manifest.is_up_to_date([ps_file], ps_file.with_suffix(".png"), params)]
+    print(f"Skipped {len(ps_files) - len(todo)} up-to-date files")
+
+    failures = {}
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {tuple(batch): executor.submit(ps_to_png, batch, [ps_file.with_suffix(".png") for ps_file in batch], args.dpi)
+                   for batch in batches(todo, args.batch_size)}
+        for batch, future in futures.items():
+            try:
+                batch_failures = future.result()
+            except Exception as error:
+                batch_failures = {ps_file: error for ps_file in batch}
+            failures.update(batch_failures)
+            for ps_file in batch:
+                if ps_file not in batch_failures:
+                    manifest.record([ps_file], ps_file.with_suffix(".png"), params)
+    manifest.save()
+
+    print(f"{len(failures)} of {len(ps_files)} files failed")
+    for ps_file, error in failures.items():
+        print(f"Failed: {ps_file}: {error}")
+    if failures:
+        sys.exit(1)
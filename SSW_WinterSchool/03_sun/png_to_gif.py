@@ -1,19 +1,65 @@
-from PIL import Image
+from PIL import Image, GifImagePlugin
 from pathlib import Path
+import argparse
 
-# List of PNG image file paths
-png_files = sorted(Path("/Users/mgjeon/JHelioviewer-SWHV/Exports").glob("JHV_2025-01-14_05.56.31-*.png"))
+import numpy as np
 
-# Open the images and store them in a list
-frames = [Image.open(file) for file in png_files]
+# Example:
+# python png_to_gif.py --input_dir ~/JHelioviewer-SWHV/Exports --pattern "JHV_2025-01-14_05.56.31-*.png"
 
-# Save the frames as a GIF
-output_gif = "output.gif"
-frames[0].save(output_gif, save_all=True, append_images=frames[1:], optimize=True, duration=1, loop=0)
-# f = Image.open(output_gif)
-# f.info['duration'] = 0.1
-# f.save("output2.gif", save_all=True)
+def iter_frames(png_files, scale=1.0):
+    """Open, convert and downscale one frame at a time"""
+    for file in png_files:
+        with Image.open(file) as image:
+            frame = image.convert("RGB")
+        if scale != 1.0:
+            frame = frame.resize((max(round(frame.width * scale), 1), max(round(frame.height * scale), 1)),
+                                 Image.Resampling.LANCZOS)
+        yield frame
 
-# import imageio
-# for filename in png_files:
+def global_palette(png_files, scale=1.0, sample=16):
+    """One 256 color palette for the whole animation, from up to `sample` evenly spaced frames"""
+    step = max(len(png_files) // sample, 1)
+    frames = [np.asarray(frame) for frame in iter_frames(png_files[::step][:sample], scale)]
+    width = min(frame.shape[1] for frame in frames)
+    montage = Image.fromarray(np.concatenate([frame[:, :width] for frame in frames], axis=0))
+    return montage.quantize(colors=256, method=Image.Quantize.MEDIANCUT)
 
+def write_gif(frames, output_gif, palette, duration=1, loop=0):
+    """Stream frames into a GIF with a single global palette
+
+    Every frame is quantized to `palette`, encoded and written right away, so only
+    one frame is held in memory, unlike Image.save(append_images=...), which keeps
+    all of them.
+    """
+    count = 0
+    with open(output_gif, "wb") as f:
+        for frame in frames:
+            frame = frame.quantize(palette=palette, dither=Image.Dither.NONE)
+            if count == 0:
+                header, _ = GifImagePlugin.getheader(frame, info={"optimize": False, "loop": loop})
+                f.write(b"".join(header))
+            f.write(b"".join(GifImagePlugin.getdata(frame, duration=duration)))
+            count += 1
+        f.write(b";")  # GIF trailer
+    return count
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--input_dir", type=str, default="")
+    parser.add_argument("--pattern", type=str, default="*.png")
+    parser.add_argument("--output", type=str, default="output.gif")
+    parser.add_argument("--stride", type=int, default=1, help="use every stride-th frame")
+    parser.add_argument("--scale", type=float, default=1.0, help="downscale factor, e.g. 0.5 for half size")
+    parser.add_argument("--duration", type=int, default=1, help="frame duration in ms")
+    parser.add_argument("--sample", type=int, default=16, help="number of frames used to build the palette")
+    args = parser.parse_args()
+
+    # List of PNG image file paths
+    png_files = sorted(Path(args.input_dir).glob(args.pattern))[::args.stride]
+    if not png_files:
+        raise ValueError("No PNG images found in the specified folder.")
+
+    palette = global_palette(png_files, args.scale, args.sample)
+    count = write_gif(iter_frames(png_files, args.scale), args.output, palette, args.duration)
+    print(f"Saved {count} frames as {args.output}")
@@ -0,0 +1,84 @@
+import argparse
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import astropy.units as u
+from exifread.utils import Ratio
+
+from eclipse_helpers import _convert_to_degress, dms_to_degrees
+
+
+def quantity_convert(value):
+    # _convert_to_degress before the unit-free path, three Quantities per coordinate
+    d = value.values[0].num / value.values[0].den * u.degree
+    m = value.values[1].num / value.values[1].den * u.arcminute
+    s = value.values[2].num / value.values[2].den * u.arcsec
+    return d + m + s
+
+
+def make_tags(n_photos, rng):
+    """GPS latitude tags and refs shaped like the ones exifread returns"""
+    degrees = rng.integers(0, 90, n_photos)
+    minutes = rng.integers(0, 60, n_photos)
+    seconds = rng.integers(0, 600000, n_photos)
+    tags = [SimpleNamespace(values=[Ratio(int(d), 1), Ratio(int(m), 1), Ratio(int(s), 10000)])
+            for d, m, s in zip(degrees, minutes, seconds)]
+    refs = rng.choice(["N", "S"], n_photos)
+    return tags, refs
+
+
+def per_photo_quantity(tags, refs):
+    return [quantity_convert(tag) if ref == "N" else 0 - quantity_convert(tag) for tag, ref in zip(tags, refs)]
+
+
+def per_photo_wrapper(tags, refs):
+    return [_convert_to_degress(tag) if ref == "N" else 0 - _convert_to_degress(tag) for tag, ref in zip(tags, refs)]
+
+
+def vectorized(tags, refs):
+    num = np.array([[value.num for value in tag.values] for tag in tags])
+    den = np.array([[value.den for value in tag.values] for tag in tags])
+    return dms_to_degrees(num, den, refs) * u.degree
+
+
+PATHS = {
+    "quantity": per_photo_quantity,
+    "wrapper": per_photo_wrapper,
+    "vectorized": vectorized,
+}
+
+
+def measure(path, tags, refs, repeat):
+    """Best time per photo in microseconds over repeat runs"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        path(tags, refs)
+        best = min(best, time.perf_counter() - start)
+    return best / len(tags) * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--photos", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--paths", type=str, nargs="+", default=list(PATHS), choices=list(PATHS))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+
+    tags, refs = make_tags(100, rng)
+    reference = u.Quantity(per_photo_quantity(tags, refs)).to_value(u.degree)
+    for name in args.paths:
+        result = u.Quantity(PATHS[name](tags, refs)).to_value(u.degree)
+        np.testing.assert_allclose(result, reference, rtol=1e-12)
+
+    print(f"{'path':>10} {'photos':>8} {'us/photo':>10} {'speedup':>8}")
+    for n_photos in args.photos:
+        tags, refs = make_tags(n_photos, rng)
+        baseline = None
+        for name in args.paths:
+            cost = measure(PATHS[name], tags, refs, args.repeat)
+            baseline = baseline or cost
+            print(f"{name:>10} {n_photos:>8} {cost:>10.2f} {baseline / cost:>7.1f}x")
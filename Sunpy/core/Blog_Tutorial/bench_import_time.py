@@ -0,0 +1,46 @@
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+# Every snippet runs in a fresh interpreter, like a short-lived worker process.
+# It prints the seconds spent after interpreter startup and the heavy modules it loaded.
+SNIPPETS = {
+    "eclipse_helpers": "import eclipse_helpers",
+    "raw arrays": "import eclipse_helpers; eclipse_helpers.get_camera_metadata_arrays({images!r})",
+    "table": "import eclipse_helpers; eclipse_helpers.get_camera_metadata_table({images!r})",
+    "eager astropy+sunpy": "import eclipse_helpers, astropy.units, astropy.table, astropy.time, sunpy.time",
+}
+
+TEMPLATE = """
+import sys, time
+start = time.perf_counter()
+{snippet}
+elapsed = time.perf_counter() - start
+loaded = [name for name in ("astropy", "sunpy") if name in sys.modules]
+print(elapsed, ",".join(loaded) or "-")
+"""
+
+
+def cold_start(snippet, images):
+    code = TEMPLATE.format(snippet=snippet.format(images=images))
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).parent)
+    elapsed, loaded = result.stdout.split()
+    return float(elapsed), loaded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=str, nargs="*", default=[],
+                        help="images read by the 'raw arrays' and 'table' snippets, none by default")
+    parser.add_argument("--snippets", type=str, nargs="+", default=list(SNIPPETS), choices=list(SNIPPETS))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'snippet':>20} {'median ms':>10} {'min ms':>8}  loaded")
+    for name in args.snippets:
+        runs = [cold_start(SNIPPETS[name], args.images) for _ in range(args.repeat)]
+        times = [elapsed * 1e3 for elapsed, _ in runs]
+        print(f"{name:>20} {statistics.median(times):>10.1f} {min(times):>8.1f}  {runs[-1][1]}")
@@ -1,7 +1,43 @@
-import astropy.units as u
-from sunpy.time import parse_time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import os
+import sqlite3
+
+import exifread
+import numpy as np
+
+# astropy and sunpy are imported inside the functions that need them, so
+# callers that only want raw EXIF numbers (get_camera_metadata_arrays, e.g. in
+# short-lived worker processes) never load them.
 
 SOLAR_ECLIPSE_IMAGE = "total_solar_eclipse2017.jpg"
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".tif", ".tiff", ".heic", ".png", ".webp")
+DMS_SCALE = np.array([1, 1 / 60, 1 / 3600])
+_NO_DMS = ([np.nan] * 3, [1] * 3)
+COLUMN_UNITS = {"exposure_time": "s", "latitude": "deg", "longitude": "deg", "altitude": "m"}
+EARTH_RADIUS_KM = 6371.0
+
+
+def dms_to_degrees(num, den, ref=None):
+    """
+    Converts GPS coordinates stored in the EXIF as (degree, arcminute, arcsec)
+    rationals to degrees in one pass, without units.
+
+    ``num`` and ``den`` are arrays of shape (..., 3). ``ref`` is an optional
+    array of "N", "S", "E" or "W", coordinates with "S" and "W" are negated.
+    """
+    degrees = np.asarray(num, dtype=float) / np.asarray(den, dtype=float) @ DMS_SCALE
+    if ref is not None:
+        degrees = np.where(np.isin(ref, ("S", "W")), -degrees, degrees)
+    return degrees
+
+
+def _dms(tag):
+    """
+    The (num, den) triplets of a GPS coordinate tag.
+    """
+    values = tag.values[:3]
+    return [value.num for value in values], [value.den for value in values]
 
 
 def _convert_to_degress(value):
@@ -9,11 +45,52 @@ def _convert_to_degress(value):
     Helper function to convert the GPS coordinates stored in the EXIF to
     degrees.
     """
-    d = value.values[0].num / value.values[0].den * u.degree
-    m = value.values[1].num / value.values[1].den * u.arcminute
-    s = value.values[2].num / value.values[2].den * u.arcsec
+    import astropy.units as u
 
-    return d + m + s
+    return dms_to_degrees(*_dms(value)) * u.degree
+
+
+def exif_datetime64(values):
+    """
+    Parses EXIF "YYYY:MM:DD HH:MM:SS" strings into a datetime64[s] array at
+    once, without per-string format detection. Missing (None or empty) and
+    invalid values become NaT.
+    """
+    values = np.asarray([value or "" for value in values], dtype="S19")
+    chars = values.view(np.uint8).reshape(len(values), 19).copy()
+    # "2017:08:21 17:30:05" -> "2017-08-21T17:30:05"
+    chars[:, [4, 7]] = ord("-")
+    chars[:, 10] = ord("T")
+    iso = chars.view("S19").ravel()
+
+    valid = values != b""
+    result = np.full(len(values), np.datetime64("NaT"), dtype="datetime64[s]")
+    try:
+        result[valid] = iso[valid].astype("datetime64[s]")
+    except ValueError:
+        # e.g. "0000:00:00 00:00:00" of cameras without a clock, only these become NaT
+        for index in np.flatnonzero(valid):
+            try:
+                result[index] = np.datetime64(iso[index].decode(), "s")
+            except ValueError:
+                pass
+    return result
+
+
+def _datetime64_to_time(values):
+    from astropy.time import Time
+
+    time = Time(values, format="datetime64", scale="utc")
+    time.format = "iso"
+    return time
+
+
+def exif_time(values):
+    """
+    One `~astropy.time.Time` array for many EXIF DateTimeOriginal strings,
+    NaT entries are masked.
+    """
+    return _datetime64_to_time(exif_datetime64(values))
 
 
 def get_exif_location(exif_data):
@@ -41,12 +118,17 @@ def get_exif_location(exif_data):
             lon = 0 - lon
 
     if gps_altitude:
+        import astropy.units as u
+
         alt = gps_altitude.values[0].num / gps_altitude.values[0].den * u.m
 
     return lat, lon, alt
 
 
 def get_camera_metadata(tags):
+    import astropy.units as u
+    from sunpy.time import parse_time
+
     camera_metadata = {}
     if "EXIF ExposureTime" in tags:
         exposure_tag = tags["EXIF ExposureTime"]
@@ -62,3 +144,260 @@ def get_camera_metadata(tags):
     camera_metadata["gps"] = get_exif_location(tags)
 
     return camera_metadata
+
+
+def read_exif(path):
+    """
+    Reads only the EXIF header of an image, the pixel data is never decoded.
+    MakerNote and thumbnail are skipped as well.
+    """
+    with open(path, "rb") as f:
+        return exifread.process_file(f, details=False)
+
+
+def _ratio(tag):
+    value = tag.values[0]
+    return value.num / value.den
+
+
+def _exif_record(path):
+    """
+    The fields of `get_camera_metadata` for one image as plain floats and
+    strings, NaN or None where a tag is missing. Latitude and longitude are
+    kept as raw (num, den) triplets and converted for all images at once.
+    """
+    tags = read_exif(path)
+    record = {
+        "exposure_time": np.nan,
+        "latitude": _NO_DMS,
+        "latitude_ref": "",
+        "longitude": _NO_DMS,
+        "longitude_ref": "",
+        "altitude": np.nan,
+        "time": None,
+        "author": tags["Image Artist"].values if "Image Artist" in tags else "",
+        "camera_model": tags["Image Model"].values if "Image Model" in tags else "",
+    }
+    if "EXIF ExposureTime" in tags:
+        record["exposure_time"] = _ratio(tags["EXIF ExposureTime"])
+    if all(tags.get(key) for key in ("GPS GPSLatitude", "GPS GPSLatitudeRef", "GPS GPSLongitude", "GPS GPSLongitudeRef")):
+        record["latitude"] = _dms(tags["GPS GPSLatitude"])
+        record["latitude_ref"] = tags["GPS GPSLatitudeRef"].values[0]
+        record["longitude"] = _dms(tags["GPS GPSLongitude"])
+        record["longitude_ref"] = tags["GPS GPSLongitudeRef"].values[0]
+    if tags.get("GPS GPSAltitude"):
+        record["altitude"] = _ratio(tags["GPS GPSAltitude"])
+    if "EXIF DateTimeOriginal" in tags:
+        record["time"] = tags["EXIF DateTimeOriginal"].values
+    return record
+
+
+def _image_paths(images):
+    if isinstance(images, (str, Path)) and Path(images).is_dir():
+        images = sorted(path for path in Path(images).iterdir() if path.suffix.lower() in IMAGE_SUFFIXES)
+    return [str(path) for path in images]
+
+
+def _read_columns(paths, max_workers=8):
+    """
+    The camera metadata of ``paths`` as plain arrays, EXIF headers are read on
+    a thread pool.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        records = list(executor.map(_exif_record, paths))
+
+    def column(name):
+        return [record[name] for record in records]
+
+    def coordinate(name):
+        num, den = np.array(column(name), dtype=float).reshape(len(records), 2, 3).transpose(1, 0, 2)
+        return dms_to_degrees(num, den, column(f"{name}_ref"))
+
+    return {
+        "path": list(paths),
+        "time": exif_datetime64(column("time")),
+        "exposure_time": np.array(column("exposure_time"), dtype=float),
+        "latitude": coordinate("latitude"),
+        "longitude": coordinate("longitude"),
+        "altitude": np.array(column("altitude"), dtype=float),
+        "author": column("author"),
+        "camera_model": column("camera_model"),
+    }
+
+
+def _columns_to_table(columns):
+    """
+    Attaches the units, once per column.
+    """
+    import astropy.units as u
+    from astropy.table import QTable
+
+    table = QTable()
+    for name, values in columns.items():
+        if name == "time":
+            table[name] = _datetime64_to_time(values)
+        elif name in COLUMN_UNITS:
+            table[name] = values * u.Unit(COLUMN_UNITS[name])
+        else:
+            table[name] = values
+    return table
+
+
+def get_camera_metadata_arrays(images, max_workers=8):
+    """
+    The columns of `get_camera_metadata_table` as a dict of plain NumPy arrays
+    and lists, without units: exposure time in s, latitude and longitude in
+    degrees, altitude in m and times as datetime64[s]. Does not import astropy
+    or sunpy.
+    """
+    return _read_columns(_image_paths(images), max_workers)
+
+
+def get_camera_metadata_table(images, max_workers=8):
+    """
+    Returns the camera metadata of many images as one table.
+
+    ``images`` is a directory or a list of image paths. The EXIF headers are
+    read on a thread pool. Every column is a single array, the units are
+    attached once per column instead of once per image. Missing values are
+    NaN, missing times are masked. Sort by time with ``table.sort("time")``.
+    """
+    return _columns_to_table(get_camera_metadata_arrays(images, max_workers))
+
+
+class MetadataIndex:
+    """
+    On-disk SQLite index of the camera metadata of a photo archive.
+
+    Rows are keyed by path, size and modification time, `update` only reads
+    the EXIF of new or modified files. Time and location are indexed columns,
+    so `query` does not rescan the archive.
+
+    >>> index = MetadataIndex("eclipse_metadata.sqlite")
+    >>> index.update("photos/")
+    >>> index.query("2017-08-21 17:15", "2017-08-21 17:25", location=(44.5, -123.3), radius=50 * u.km)
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS photos ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, time INTEGER, "
+                "exposure_time REAL, latitude REAL, longitude REAL, altitude REAL, "
+                "author TEXT, camera_model TEXT)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS photos_time ON photos (time)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS photos_location ON photos (latitude, longitude)")
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def update(self, images, max_workers=8):
+        """
+        Indexes ``images``, a directory or a list of paths, and returns the
+        number of files whose metadata was (re)read. For a directory, rows of
+        files that were removed from it are dropped.
+        """
+        paths = [os.path.abspath(path) for path in _image_paths(images)]
+        known = {path: (size, mtime_ns) for path, size, mtime_ns
+                 in self.connection.execute("SELECT path, size, mtime_ns FROM photos")}
+        stats = {}
+        for path in paths:
+            stat = os.stat(path)
+            stats[path] = (stat.st_size, stat.st_mtime_ns)
+        changed = [path for path in paths if known.get(path) != stats[path]]
+
+        columns = _read_columns(changed, max_workers)
+        seconds = [None if np.isnat(time) else int(time.astype(np.int64)) for time in columns["time"]]
+        rows = zip(
+            changed,
+            (stats[path][0] for path in changed),
+            (stats[path][1] for path in changed),
+            seconds,
+            *(columns[name].tolist() for name in ("exposure_time", "latitude", "longitude", "altitude")),
+            columns["author"],
+            columns["camera_model"],
+        )
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO photos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            if isinstance(images, (str, Path)) and Path(images).is_dir():
+                directory = Path(os.path.abspath(images))
+                removed = [(path,) for path in known if Path(path).parent == directory and path not in stats]
+                self.connection.executemany("DELETE FROM photos WHERE path = ?", removed)
+        return len(changed)
+
+    def query(self, start=None, end=None, location=None, radius=None):
+        """
+        Returns the photos taken between ``start`` and ``end`` and, with a
+        ``location`` (latitude, longitude) and ``radius``, within that
+        great-circle distance of it, as a table sorted by time.
+
+        The index narrows the rows down to a latitude/longitude box around the
+        location, the exact distance is only computed for those.
+        """
+        conditions = []
+        parameters = []
+        if start is not None:
+            conditions.append("time >= ?")
+            parameters.append(_unix_seconds(start))
+        if end is not None:
+            conditions.append("time <= ?")
+            parameters.append(_unix_seconds(end))
+        if location is not None:
+            import astropy.units as u
+
+            lat, lon = (u.Quantity(value, u.degree).to_value(u.degree) for value in location)
+            radius_km = u.Quantity(radius, u.km).to_value(u.km)
+            angle = np.degrees(radius_km / EARTH_RADIUS_KM)
+            conditions.append("latitude BETWEEN ? AND ?")
+            parameters += [lat - angle, lat + angle]
+            if abs(lat) + angle < 90:
+                dlon = np.degrees(np.arcsin(np.sin(np.radians(angle)) / np.cos(np.radians(lat))))
+                # Boxes across the antimeridian are only filtered by the exact distance below
+                if -180 <= lon - dlon and lon + dlon <= 180:
+                    conditions.append("longitude BETWEEN ? AND ?")
+                    parameters += [lon - dlon, lon + dlon]
+
+        sql = ("SELECT path, time, exposure_time, latitude, longitude, altitude, author, camera_model FROM photos"
+               + (" WHERE " + " AND ".join(conditions) if conditions else "") + " ORDER BY time")
+        rows = self.connection.execute(sql, parameters).fetchall()
+        path, seconds, exposure_time, latitude, longitude, altitude, author, camera_model = (
+            zip(*rows) if rows else [()] * 8)
+
+        seconds = np.array(seconds, dtype=float)
+        time = np.full(len(rows), np.datetime64("NaT"), dtype="datetime64[s]")
+        valid = ~np.isnan(seconds)
+        time[valid] = seconds[valid].astype(np.int64).astype("datetime64[s]")
+        columns = {
+            "path": np.array(path, dtype=str),
+            "time": time,
+            "exposure_time": np.array(exposure_time, dtype=float),
+            "latitude": np.array(latitude, dtype=float),
+            "longitude": np.array(longitude, dtype=float),
+            "altitude": np.array(altitude, dtype=float),
+            "author": np.array(author, dtype=str),
+            "camera_model": np.array(camera_model, dtype=str),
+        }
+        if location is not None:
+            keep = _great_circle_km(lat, lon, columns["latitude"], columns["longitude"]) <= radius_km
+            columns = {name: values[keep] for name, values in columns.items()}
+        return _columns_to_table(columns)
+
+
+def _unix_seconds(time):
+    from sunpy.time import parse_time
+
+    return int(parse_time(time).datetime64.astype("datetime64[s]").astype(np.int64))
+
+
+def _great_circle_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))